@@ -0,0 +1,331 @@
+"""
+Benchmarks for nosqlite.
+
+Runs a set of workloads against a LocalServer (a client opened on a
+directory) and against a Server on localhost, optionally also one
+that serves the reads from memory ('hot'), at several data sizes,
+and writes the timings as JSON, so that the results of two versions
+can be compared.
+
+USAGE:
+
+    Run all workloads and save the results::
+
+        python benchmark.py --output results.json
+
+    Run some workloads at given sizes on the local server only::
+
+        python benchmark.py --targets local --sizes 1000 100000 \\
+                            --workloads insert_batch find_scan
+
+    Compare two result files; slowdowns over 10% are flagged::
+
+        python benchmark.py --compare old.json new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import nosqlite
+
+# number of requests made by the workloads that do one request per
+# operation, since these are much slower than the batch workloads
+SINGLE_OPS = 500
+
+###########################################################################
+# Workloads
+#
+#   Each workload is a function (client, size) that returns the number
+#   of operations it timed and the seconds they took.  It gets a fresh
+#   database, but may set one up before it starts its clock.
+###########################################################################
+
+def _docs(size):
+    return [{'a':i, 'b':i % 100, 'c':'x%s'%i} for i in range(size)]
+
+def _setup(client, size, index=False):
+    C = client.bench.C
+    C.insert(_docs(size))
+    if index:
+        C.ensure_index(a=1)
+    return C
+
+def insert_single(client, size):
+    C = client.bench.C
+    n = min(size, SINGLE_OPS)
+    docs = _docs(n)
+    start = time.time()
+    for d in docs:
+        C.insert(d)
+    return n, time.time() - start
+
+def insert_batch(client, size):
+    C = client.bench.C
+    docs = _docs(size)
+    start = time.time()
+    C.insert(docs)
+    return size, time.time() - start
+
+def insert_heterogeneous(client, size):
+    C = client.bench.C
+    docs = [dict([('k%s'%(i % 10), i), ('k%s'%(i % 7), i)]) for i in range(size)]
+    start = time.time()
+    C.insert(docs)
+    return size, time.time() - start
+
+def find_scan(client, size):
+    C = _setup(client, size)
+    start = time.time()
+    n = len(list(C.find(batch_size=1000)))
+    return n, time.time() - start
+
+def find_indexed(client, size):
+    C = _setup(client, size, index=True)
+    n = min(size, SINGLE_OPS)
+    step = max(1, size // n)
+    start = time.time()
+    for i in range(n):
+        C.find_one(a=i*step)
+    return n, time.time() - start
+
+def count(client, size):
+    C = _setup(client, size)
+    n = min(size, SINGLE_OPS) // 10 or 1
+    start = time.time()
+    for i in range(n):
+        C.count('b<50')
+    return n, time.time() - start
+
+def update(client, size):
+    C = _setup(client, size)
+    start = time.time()
+    C.update({'c':'y'}, 'b<50')
+    return size, time.time() - start
+
+def update_many(client, size):
+    C = _setup(client, size, index=True)
+    start = time.time()
+    C.update_many([({'a':i}, {'c':'y%s'%i}) for i in range(size)])
+    return size, time.time() - start
+
+def upsert(client, size):
+    C = client.bench.C
+    C.upsert(_docs(size // 2), key='a')
+    start = time.time()
+    C.upsert(_docs(size), key='a')
+    return size, time.time() - start
+
+def like(client, size):
+    C = _setup(client, size)
+    n = min(size, SINGLE_OPS) // 10 or 1
+    start = time.time()
+    for i in range(n):
+        C.find("c LIKE '%%x%s%%'"%i).next()
+    return n, time.time() - start
+
+def search(client, size):
+    C = _setup(client, size)
+    C.ensure_text_index('c')
+    n = min(size, SINGLE_OPS) // 10 or 1
+    start = time.time()
+    for i in range(n):
+        C.search('x%s'%i, limit=1)
+    return n, time.time() - start
+
+def delete(client, size):
+    C = _setup(client, size)
+    start = time.time()
+    C.delete('b<50')
+    return size, time.time() - start
+
+def copy(client, size):
+    C = _setup(client, size)
+    start = time.time()
+    C.copy('D')
+    return size, time.time() - start
+
+def copy_across(client, size):
+    C = _setup(client, size)
+    start = time.time()
+    C.copy(client.bench2.C)
+    return size, time.time() - start
+
+def csv_export(client, size):
+    C = _setup(client, size)
+    path = os.path.join(tempfile.mkdtemp(), 'export.csv')
+    try:
+        start = time.time()
+        C.export_csv(path)
+        return size, time.time() - start
+    finally:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+def csv_import(client, size):
+    C = _setup(client, size)
+    path = os.path.join(tempfile.mkdtemp(), 'export.csv')
+    try:
+        C.export_csv(path)
+        start = time.time()
+        client.bench.D.import_csv(path)
+        return size, time.time() - start
+    finally:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+def _sharded(shards):
+    def insert_and_scan(client, size):
+        S = nosqlite.ShardedCollection('C', 'a', [client.__getattr__('shard%s'%i)
+                                                 for i in range(shards)])
+        start = time.time()
+        S.insert(_docs(size))
+        n = len(list(S.find('b<50', order_by='a')))
+        return size + n, time.time() - start
+    return insert_and_scan
+
+WORKLOADS = [
+    ('insert_single', insert_single),
+    ('insert_batch', insert_batch),
+    ('insert_heterogeneous', insert_heterogeneous),
+    ('find_scan', find_scan),
+    ('find_indexed', find_indexed),
+    ('count', count),
+    ('update', update),
+    ('update_many', update_many),
+    ('upsert', upsert),
+    ('like', like),
+    ('search', search),
+    ('delete', delete),
+    ('copy', copy),
+    ('copy_across', copy_across),
+    ('csv_export', csv_export),
+    ('csv_import', csv_import),
+    ('sharded_1', _sharded(1)),
+    ('sharded_2', _sharded(2)),
+    ('sharded_4', _sharded(4)),
+]
+
+###########################################################################
+# Targets
+###########################################################################
+
+class Target(object):
+    """
+    Creates a fresh client for each run of a workload.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.directory = tempfile.mkdtemp()
+        self.server = None
+        if name == 'server':
+            self.server = nosqlite.Server(directory=self.directory, port=0, metrics=False)
+        elif name == 'hot':
+            # the reads of the database of the workloads are from memory
+            self.server = nosqlite.Server(directory=self.directory, port=0, metrics=False,
+                                          hot=['bench'])
+        elif name != 'local':
+            raise ValueError, "unknown target '%s'"%name
+
+    def client(self):
+        # every run starts with no database files
+        for x in os.listdir(self.directory):
+            os.unlink(os.path.join(self.directory, x))
+        if self.server is None:
+            return nosqlite.Client(self.directory)
+        return nosqlite.Client(self.server.port)
+
+    def close(self):
+        if self.server is not None:
+            self.server.quit()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+###########################################################################
+# Running and comparing
+###########################################################################
+
+def run(targets, workloads, sizes, repeat=3, out=sys.stdout):
+    """
+    Run the given workloads and return the results as a dictionary.
+    """
+    results = []
+    for target_name in targets:
+        target = Target(target_name)
+        try:
+            for name, f in WORKLOADS:
+                if name not in workloads:
+                    continue
+                for size in sizes:
+                    seconds = []
+                    for i in range(repeat):
+                        ops, t = f(target.client(), size)
+                        seconds.append(t)
+                    best = min(seconds)
+                    results.append({'target':target_name, 'workload':name, 'size':size,
+                                    'ops':ops, 'seconds':seconds, 'best':best,
+                                    'ops_per_second':ops/best if best else None})
+                    out.write('%-8s %-22s %8s %10.4fs %12.0f ops/s\n'%(
+                        target_name, name, size, best, ops/best if best else 0))
+                    out.flush()
+        finally:
+            target.close()
+    return {'time':time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python':platform.python_version(),
+            'sqlite':sqlite3.sqlite_version,
+            'platform':platform.platform(),
+            'repeat':repeat,
+            'results':results}
+
+def compare(old, new, threshold=0.1, out=sys.stdout):
+    """
+    Print the ratio of the best times in the results new and old of
+    each workload, and return the number of slowdowns larger than
+    threshold.
+    """
+    key = lambda r: (r['target'], r['workload'], r['size'])
+    before = dict([(key(r), r) for r in old['results']])
+    slower = 0
+    out.write('%-8s %-22s %8s %10s %10s %8s\n'%('target', 'workload', 'size', 'old', 'new', 'ratio'))
+    for r in new['results']:
+        if key(r) not in before:
+            continue
+        a, b = before[key(r)]['best'], r['best']
+        ratio = b/a if a else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  SLOWER'
+            slower += 1
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+        out.write('%-8s %-22s %8s %9.4fs %9.4fs %8.2f%s\n'%(key(r) + (a, b, ratio, flag)))
+    return slower
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark nosqlite.')
+    parser.add_argument('--targets', nargs='+', default=['local', 'server'],
+                        choices=['local', 'server', 'hot'])
+    parser.add_argument('--workloads', nargs='+', default=[name for name, f in WORKLOADS],
+                        choices=[name for name, f in WORKLOADS])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown that counts as a regression')
+    args = parser.parse_args(args)
+    if args.compare:
+        old, new = [json.load(open(x)) for x in args.compare]
+        return 1 if compare(old, new, args.threshold) else 0
+    results = run(args.targets, args.workloads, args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())